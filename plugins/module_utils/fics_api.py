@@ -0,0 +1,265 @@
+# Copyright: (c) 2024, David Villafaña <david.villafana@capcu.org>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Helpers shared by every FICS module: the api call log, the pooled HTTP session and
+# the chunked base64 report writer. AnsiballZ bundles this file with each module.
+from __future__ import absolute_import, division, print_function
+from ansible.module_utils.basic import AnsibleModule
+from typing import Callable, Any
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import atexit
+import queue
+import functools
+import itertools
+import json
+import os
+import tempfile
+import base64
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import pybase64
+
+    HAS_PYBASE64 = True
+except ImportError:
+    HAS_PYBASE64 = False
+
+__metaclass__ = type
+
+
+@functools.lru_cache(maxsize=None)
+def ensure_dir(path: str) -> None:
+    # makedirs stats every component of the path, only do that once per directory
+    os.makedirs(path, exist_ok=True)
+
+
+# every log path gets a logger of its own, numbered in order of first use, so a record
+# only ever reaches the api_calls.log of the path it was logged for
+_LOGGER_IDS = itertools.count()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_logger(log_path: str) -> logging.Logger:
+    # Ensure the log directory exists, this only runs once per log path
+    ensure_dir(log_path)
+
+    # wrapped calls log through a logger that does not propagate up to the root logger
+    logger = logging.getLogger(f"fics.api_calls.{next(_LOGGER_IDS)}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    # Create a file handler that stays attached for the rest of the run
+    handler = RotatingFileHandler(
+        f"{log_path}/api_calls.log", maxBytes=10 << 20, backupCount=3, delay=True
+    )
+    handler.setLevel(logging.INFO)
+
+    # Create a logging format
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+
+    # The file handler runs on a background listener thread so API calls never
+    # wait on log writes, stopping it at exit flushes anything still queued
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(QueueHandler(log_queue))
+    return logger
+
+
+# the response field that carries a whole base64 document, it is logged by length only
+# so error and exception messages still show up in full
+_LOG_ELIDED_KEYS = frozenset({"DocumentBase64"})
+
+
+def _summarize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: (
+                f"<{len(item)} chars>"
+                if key in _LOG_ELIDED_KEYS and isinstance(item, str)
+                else _summarize(item)
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_summarize(item) for item in value]
+    return value
+
+
+def log_function_call(log_path: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    logger = _get_logger(log_path)
+
+    try:
+        # Log the function call and its arguments as a single record
+        logger.info("call=%s args=%r kwargs=%r", func.__name__, args, kwargs)
+
+        # Call the function and get the result
+        result = func(*args, **kwargs)
+
+        # Log the function's return value, the response can carry whole documents
+        # so only build the record when INFO is enabled and elide the long strings
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("result=%r", _summarize(result))
+
+        return result
+
+    except Exception as e:
+        logger.exception("Exception occurred: %s", e)
+        raise
+
+
+@functools.lru_cache(maxsize=None)
+def _get_session():
+    # requests is only imported once a call is actually made, so argument
+    # failures and check mode exit without paying for it
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    # one pooled session per module run so repeated calls reuse the TCP/TLS connection.
+    # Every call is a POST and some of them change data on the server, so only retry
+    # responses where the server turned the request away (429/503) and failed connects.
+    # A 502/504 from a gateway, like a read timeout, may mean the backend is still running it
+    retry = Retry(
+        total=5,
+        read=0,
+        backoff_factor=0.5,
+        status_forcelist=(429, 503),
+        allowed_methods=frozenset({"GET", "POST", "PUT", "DELETE"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session = requests.Session()
+    session.headers.update({"Content-Type": "application/json"})
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# the verbs call_api accepts, anything else is a caller bug
+_HTTP_METHODS = frozenset({"post", "get", "put", "delete"})
+
+# connect timeout in seconds, the read timeout comes from the api_timeout option since
+# building a report can keep the server busy for minutes
+_API_CONNECT_TIMEOUT = 5
+
+
+def send_request(url: str, method: str, parameters: dict, api_timeout: int):
+    if method not in _HTTP_METHODS:
+        raise ValueError(f"Invalid API method '{method}'")
+
+    # Encode the body once up front, orjson (when installed) goes straight to bytes
+    # and the stdlib fallback writes the same compact, unescaped UTF-8 so the server
+    # gets the same bytes whichever library is installed
+    data: bytes
+    if HAS_ORJSON:
+        data = orjson.dumps(parameters)
+    else:
+        data = json.dumps(parameters, separators=(",", ":"), ensure_ascii=False).encode()
+
+    # Send the request over the shared session, the JSON content type is set on it once.
+    # Timeouts and connects that fail past the retries raise RequestException
+    return _get_session().request(
+        method.upper(),
+        url,
+        timeout=(_API_CONNECT_TIMEOUT, api_timeout),
+        data=data,
+    )
+
+
+def decode_response(response) -> Any:
+    # orjson decodes the raw body bytes directly and is much faster on large documents.
+    # It rejects a UTF-8 BOM and ignores a declared charset, requests' own decoding
+    # handles both, so a body orjson cannot read goes through response.json() instead
+    if HAS_ORJSON:
+        try:
+            return orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            pass
+    return response.json()
+
+
+def call_api(
+    base_url: str, method: str, endpoint: str, parameters: dict, api_timeout: int
+):
+    # A RequestException propagates, log_function_call writes it to the api log
+    # before run_module fails the task with it
+    response = send_request(base_url + endpoint, method, parameters, api_timeout)
+
+    # Capture the response
+    if response.status_code == 200:
+        return decode_response(response)
+    else:
+        print(
+            f"Error response code ({response.status_code}) from api call: {response.text}"
+        )
+        return None
+
+
+# base64 decodes in 4 character groups so any slice that is a multiple of 4 decodes on its own,
+# 1 MiB of base64 per slice decodes to 768 KiB, which BufferedWriter hands straight to
+# write(2) without copying and keeps writing until all of it is on disk
+_BASE64_CHUNK_SIZE = 1 << 20
+
+
+def _decode_base64_to_temp(path: str, base64_file: str) -> str:
+    # Line wrapped payloads (.NET InsertLineBreaks) carry CRLFs that the old whole
+    # document b64decode skipped, drop them so every slice holds whole 4 character groups.
+    # Padding only belongs at the very end, a slice that ends in it would still validate
+    base64_file = "".join(base64_file.split())
+    if len(base64_file) % 4 or base64_file.find("=", 0, len(base64_file) - 2) != -1:
+        raise ValueError("malformed base64 document in api response")
+
+    # pybase64 (when installed) decodes with SIMD, otherwise use the stdlib decoder,
+    # validate=True rejects anything outside the base64 alphabet instead of skipping it
+    b64decode = pybase64.b64decode if HAS_PYBASE64 else base64.b64decode
+
+    # Decode the document a slice at a time so the full decoded file is never held in memory.
+    # The slices go to a fresh temp file in the same directory as path and the caller moves
+    # it into place, the temp file is removed again if any slice fails to decode
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path)
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for i in range(0, len(base64_file), _BASE64_CHUNK_SIZE):
+                f.write(b64decode(base64_file[i : i + _BASE64_CHUNK_SIZE], validate=True))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path
+
+
+def write_base64_files(module: AnsibleModule, documents: dict) -> None:
+    # A symlinked dest keeps pointing at the new report, its target is what gets replaced
+    documents = {os.path.realpath(path): data for path, data in documents.items()}
+
+    # Every document is decoded before any of them is moved into place, so one bad
+    # payload never truncates a report that is already there or leaves new files next
+    # to old ones. atomic_move keeps the mode, owner and SELinux context of an existing
+    # dest and gives a new one the usual umask based permissions
+    tmp_paths: dict = {}
+    try:
+        for path, base64_file in documents.items():
+            tmp_paths[path] = _decode_base64_to_temp(path, base64_file)
+        for path, tmp_path in tmp_paths.items():
+            module.atomic_move(tmp_path, path)
+    finally:
+        for tmp_path in tmp_paths.values():
+            module.cleanup(tmp_path)
+
+
+def write_base64_file(module: AnsibleModule, path: str, base64_file: str) -> None:
+    write_base64_files(module, {path: base64_file})
@@ -4,11 +4,15 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 from __future__ import absolute_import, division, print_function
 from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_api import (
+    decode_response,
+    ensure_dir,
+    send_request,
+    write_base64_file,
+)
 from typing import Optional
-import requests
 from datetime import datetime
 import os
-import base64
 
 __metaclass__ = type
 
@@ -29,7 +33,10 @@ description:
 author:
     - David Villafaña IV
 
-requirements: [ ]
+requirements:
+     - requests >= 2.32.3
+     - orjson (optional, faster JSON encoding and decoding)
+     - pybase64 (optional, faster base64 decoding of the report)
 
 options:
     dest:
@@ -44,7 +51,11 @@ options:
         description: this is the api token used for authentication to the API
         required: true
         type: str
-
+    api_timeout:
+        description: the number of seconds to wait for the API to respond before failing, building a report can take several minutes
+        required: false
+        default: 300
+        type: int
 """
 
 EXAMPLES = r"""
@@ -60,29 +71,26 @@ RETURN = r"""
 
 
 def call_api(
-    base_url: str, method: str, endpoint: str, parameters: dict, module: dict
+    base_url: str,
+    method: str,
+    endpoint: str,
+    parameters: dict,
+    module: dict,
+    api_timeout: int,
 ) -> Optional[dict]:
-    headers = {
-        "Content-Type": "application/json",
-    }
+    # requests is only imported once a call is actually made, so argument
+    # failures and check mode exit without paying for it
+    from requests.exceptions import RequestException
 
-    if method == "post":
-        response = requests.post(base_url + endpoint, json=parameters, headers=headers)
-    elif method == "get":
-        response = requests.get(base_url + endpoint, json=parameters, headers=headers)
-    elif method == "put":
-        response = requests.put(base_url + endpoint, json=parameters, headers=headers)
-    elif method == "delete":
-        response = requests.delete(
-            base_url + endpoint, json=parameters, headers=headers
-        )
-    else:
+    try:
+        response = send_request(base_url + endpoint, method, parameters, api_timeout)
+    except (ValueError, RequestException) as e:
         module.fail_json(
-            msg=f"Invalid API method '{method}'", changed=False, failed=True
+            msg=f"Error sending api call: {e}", changed=False, failed=True
         )
 
     if response.status_code == 200:
-        return response.json()
+        return decode_response(response)
     else:
         module.fail_json(
             msg=f"Error response code ({response.status_code}) from api call: {response.text}",
@@ -91,7 +99,9 @@ def call_api(
         )
 
 
-def get_create_allied_insurance_interface_file(module: dict) -> Optional[dict]:
+def get_create_allied_insurance_interface_file(
+    module: dict, system_time: str
+) -> Optional[dict]:
     params: dict = {
         "CreateRequest": {
             "FilePath": "sample string",
@@ -112,7 +122,7 @@ def get_create_allied_insurance_interface_file(module: dict) -> Optional[dict]:
             ],
             "Payees": [1, 1],
             "ErrorMessage": "sample string",
-            "SystemDate": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            "SystemDate": system_time,
             "Token": module.params["api_token"],
             "ApiParameters": "sample string",
         }
@@ -123,6 +133,7 @@ def get_create_allied_insurance_interface_file(module: dict) -> Optional[dict]:
         "CreateAlliedInsuranceInterfaceFile",
         parameters=params,
         module=module,
+        api_timeout=module.params["api_timeout"],
     )
 
 
@@ -131,6 +142,7 @@ def run_module():
         dest=dict(type="str", required=True, no_log=False),
         special_service_api_url=dict(type="str", required=True, no_log=False),
         api_token=dict(type="str", required=True, no_log=True),
+        api_timeout=dict(type="int", required=False, default=300, no_log=False),
     )
 
     # seed the result dict in the object
@@ -147,6 +159,14 @@ def run_module():
     module = AnsibleModule(argument_spec=module_args, supports_check_mode=False)
 
     output_file_path: str = module.params["dest"]
+    system_time: str = datetime.now().isoformat(timespec="seconds")
+
+    if module.params["api_timeout"] <= 0:
+        module.fail_json(
+            msg="api_timeout must be a positive number of seconds",
+            changed=False,
+            failed=True,
+        )
 
     # if the user is working with this module in only check mode we do not
     # want to make any changes to the environment, just return the current
@@ -155,20 +175,20 @@ def run_module():
         module.exit_json(**result)
 
     try:
-        os.makedirs(name=str(os.path.dirname(output_file_path)), exist_ok=True)
+        ensure_dir(str(os.path.dirname(output_file_path)))
     except Exception as e:
         module.fail_json(
             msg=f"failed to create parent directories: {e}", changed=False, failed=True
         )
 
-    api_response: dict = get_create_allied_insurance_interface_file(module)
+    api_response: dict = get_create_allied_insurance_interface_file(
+        module, system_time
+    )
     try:
         if api_response.get("ApiCallSuccessful", None):
             base64_file = api_response.get("File", None)
             if base64_file:
-                txt_data = base64.b64decode(base64_file)
-                with open(module.params["dest"], "wb") as txt_file:
-                    txt_file.write(txt_data)
+                write_base64_file(module, module.params["dest"], base64_file)
                 result["changed"] = True
                 result["failed"] = False
                 result["msg"] = f"Wrote file at {module.params['dest']}"
@@ -4,11 +4,13 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 from __future__ import absolute_import, division, print_function
 from ansible.module_utils.basic import AnsibleModule
-from typing import Optional, Callable, Any
-import requests
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_api import (
+    decode_response,
+    log_function_call,
+    send_request,
+)
+from typing import Optional
 from datetime import datetime
-import logging
-import os
 from urllib.parse import urljoin as join
 
 __metaclass__ = type
@@ -35,6 +37,7 @@ requirements:
      - logging >= 0.4.9.6
      - requests >= 2.32.3
      - datetime >= 5.5
+     - orjson (optional, faster JSON encoding and decoding)
 
 options:
     api_url:
@@ -49,6 +52,11 @@ options:
         description: this is the directory that the API logs will be created in
         required: false
         type: str
+    api_timeout:
+        description: the number of seconds to wait for the API to respond before failing, building a report can take several minutes
+        required: false
+        default: 300
+        type: int
 """
 
 EXAMPLES = r"""
@@ -63,80 +71,27 @@ RETURN = r"""
 """
 
 
-def log_function_call(log_path: str, func: Callable[..., Any], *args, **kwargs) -> Any:
-    # Ensure the directory for the log file exists
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-
-    # Set up logging
-    logger = logging.getLogger(func.__name__)
-    logger.setLevel(logging.INFO)
-
-    # Create a file handler
-    handler = logging.FileHandler(f"{log_path}/api_calls.log")
-    handler.setLevel(logging.INFO)
-
-    # Create a logging format
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    handler.setFormatter(formatter)
-
-    # Add the handler to the logger
-    logger.addHandler(handler)
-
-    try:
-        # Log the function call and its arguments
-        logger.info(f"Calling {func.__name__}")
-        logger.info(f"Args: {args}")
-        logger.info(f"Kwargs: {kwargs}")
-
-        # Call the function and get the result
-        result = func(*args, **kwargs)
-
-        # Log the function's return value
-        logger.info(f"Result: {result}")
-
-        return result
-
-    except Exception as e:
-        logger.exception(f"Exception occurred: {str(e)}")
-        raise
-
-    finally:
-        # Remove the handler to avoid duplicate logs in future calls
-        logger.removeHandler(handler)
-
-
 def call_api(
-    base_url: str, method: str, endpoint: str, parameters: dict, module: dict
+    base_url: str,
+    method: str,
+    endpoint: str,
+    parameters: dict,
+    module: dict,
+    api_timeout: int,
 ) -> Optional[dict]:
-    headers = {
-        "Content-Type": "application/json",
-    }
+    # requests is only imported once a call is actually made, so argument
+    # failures and check mode exit without paying for it
+    from requests.exceptions import RequestException
 
-    if method == "post":
-        response = requests.post(
-            join(base_url, endpoint), json=parameters, headers=headers
-        )
-    elif method == "get":
-        response = requests.get(
-            join(base_url, endpoint), json=parameters, headers=headers
-        )
-    elif method == "put":
-        response = requests.put(
-            join(base_url, endpoint), json=parameters, headers=headers
-        )
-    elif method == "delete":
-        response = requests.delete(
-            join(base_url, endpoint), json=parameters, headers=headers
-        )
-    else:
+    try:
+        response = send_request(join(base_url, endpoint), method, parameters, api_timeout)
+    except (ValueError, RequestException) as e:
         module.fail_json(
-            msg=f"Invalid API method '{method}'", changed=False, failed=True
+            msg=f"Error sending api call: {e}", changed=False, failed=True
         )
 
     if response.status_code == 200:
-        return response.json()
+        return decode_response(response)
     else:
         module.fail_json(
             msg=f"Error response code ({response.status_code}) from api call: {response.text}",
@@ -151,6 +106,7 @@ def create_metro_2_file_and_report(
     api_token: str,
     system_time: str,
     api_log_directory: str,
+    api_timeout: int,
     module,
 ) -> dict:
     # TODO: yes I know that module should not be passed in as it makes the function more impure but I'll rewrite this to use exception handling or error return types in the future... maybe
@@ -178,11 +134,12 @@ def create_metro_2_file_and_report(
         endpoint="/BatchService.svc/REST/CreateMetro2FileAndReport",
         parameters=params,
         module=module,
+        api_timeout=api_timeout,
     )
 
 
 def get_ms_company_information(
-    api_url: str, api_token: str, api_log_directory: str, module
+    api_url: str, api_token: str, api_log_directory: str, api_timeout: int, module
 ) -> dict:
     # TODO: yes I know that module should not be passed in as it makes the function more impure but I'll rewrite this to use exception handling or error return types in the future... maybe
     params: dict = {"Message": {"Token": api_token}}
@@ -194,6 +151,7 @@ def get_ms_company_information(
         endpoint="/MortgageServicerService.svc/REST/GetMsCompanyInformation",
         parameters=params,
         module=module,
+        api_timeout=api_timeout,
     )
 
 
@@ -202,6 +160,7 @@ def run_module():
         api_url=dict(type="str", required=True, no_log=False),
         api_token=dict(type="str", required=True, no_log=True),
         api_log_directory=dict(type="str", required=False, no_log=False),
+        api_timeout=dict(type="int", required=False, default=300, no_log=False),
     )
 
     # seed the result dict in the object
@@ -219,8 +178,16 @@ def run_module():
 
     api_url: str = module.params["api_url"]
     api_token: str = module.params["api_token"]
-    system_time: str = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    system_time: str = datetime.now().isoformat(timespec="seconds")
     api_log_directory: str = module.params["api_log_directory"]
+    api_timeout: int = module.params["api_timeout"]
+
+    if api_timeout <= 0:
+        module.fail_json(
+            msg="api_timeout must be a positive number of seconds",
+            changed=False,
+            failed=True,
+        )
 
     # if the user is working with this module in only check mode we do not
     # want to make any changes to the environment, just return the current
@@ -232,6 +199,7 @@ def run_module():
         api_url=api_url,
         api_token=api_token,
         api_log_directory=api_log_directory,
+        api_timeout=api_timeout,
         module=module,
     )["FilePath"]
     bureau_response: dict = create_metro_2_file_and_report(
@@ -239,6 +207,7 @@ def run_module():
         api_token=api_token,
         api_url=api_url,
         api_log_directory=api_log_directory,
+        api_timeout=api_timeout,
         system_time=system_time,
         module=module,
     )
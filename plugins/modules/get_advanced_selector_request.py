@@ -4,10 +4,10 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 from __future__ import absolute_import, division, print_function
 from ansible.module_utils.basic import AnsibleModule
-from typing import Callable, Any
-import requests
-import logging
-import os
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_api import (
+    log_function_call,
+    call_api,
+)
 
 __metaclass__ = type
 
@@ -32,6 +32,7 @@ author:
 requirements:
      - logging >= 0.4.9.6
      - requests >= 2.32.3
+     - orjson (optional, faster JSON encoding and decoding)
 
 options:
     query_list:
@@ -51,6 +52,11 @@ options:
         description: this is the directory that the API logs will be created in
         required: false
         type: str
+    api_timeout:
+        description: the number of seconds to wait for the API to respond before failing, building a report can take several minutes
+        required: false
+        default: 300
+        type: int
 """
 
 EXAMPLES = r"""
@@ -68,77 +74,7 @@ RETURN = r"""
 """
 
 
-def log_function_call(log_path: str, func: Callable[..., Any], *args, **kwargs) -> Any:
-    # Ensure the directory for the log file exists
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-
-    # Set up logging
-    logger = logging.getLogger(func.__name__)
-    logger.setLevel(logging.INFO)
-
-    # Create a file handler
-    handler = logging.FileHandler(f"{log_path}/api_calls.log")
-    handler.setLevel(logging.INFO)
-
-    # Create a logging format
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    handler.setFormatter(formatter)
-
-    # Add the handler to the logger
-    logger.addHandler(handler)
-
-    try:
-        # Log the function call and its arguments
-        logger.info(f"Calling {func.__name__}")
-        logger.info(f"Args: {args}")
-        logger.info(f"Kwargs: {kwargs}")
-
-        # Call the function and get the result
-        result = func(*args, **kwargs)
-
-        # Log the function's return value
-        logger.info(f"Result: {result}")
-
-        return result
-
-    except Exception as e:
-        logger.exception(f"Exception occurred: {str(e)}")
-        raise
-
-    finally:
-        # Remove the handler to avoid duplicate logs in future calls
-        logger.removeHandler(handler)
-
-
-def call_api(base_url: str, method: str, endpoint: str, parameters: dict):
-    # Define the headers (if required)
-    headers = {
-        "Content-Type": "application/json",  # Adjust the content type as needed
-    }
-
-    # Send the POST request
-
-    http: dict = {
-        "post": requests.post,
-        "get": requests.get,
-        "put": requests.put,
-        "delete": requests.delete,
-    }
-    response = http[method](base_url + endpoint, json=parameters, headers=headers)
-
-    # Capture the response
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(
-            f"Error response code ({response.status_code}) from api call: {response.text}"
-        )
-        return None
-
-
-def get_advanced_selector_request(api_url: str, api_token: str, api_log_directory: str, query_list: list[dict]) -> dict:
+def get_advanced_selector_request(api_url: str, api_token: str, api_log_directory: str, query_list: list[dict], api_timeout: int) -> dict:
     params: dict = {
         "Message": {
             "Content": {
@@ -154,6 +90,7 @@ def get_advanced_selector_request(api_url: str, api_token: str, api_log_director
         "post",
         "GetAdvancedSelectorRequest",
         parameters=params,
+        api_timeout=api_timeout,
     )
 
 
@@ -163,6 +100,7 @@ def run_module():
         core_api_url=dict(type="str", required=True, no_log=False),
         api_token=dict(type="str", required=True, no_log=True),
         api_log_directory=dict(type="str", required=False, no_log=False),
+        api_timeout=dict(type="int", required=False, default=300, no_log=False),
     )
 
     # seed the result dict in the object
@@ -181,17 +119,37 @@ def run_module():
     api_url: str = module.params["core_api_url"]
     api_token: str = module.params["api_token"]
     api_log_directory: str = module.params["api_log_directory"]
+    api_timeout: int = module.params["api_timeout"]
     query_list: list[dict] = module.params["query_list"]
 
+    if api_timeout <= 0:
+        module.fail_json(
+            msg="api_timeout must be a positive number of seconds",
+            changed=False,
+            failed=True,
+        )
+
     # if the user is working with this module in only check mode we do not
     # want to make any changes to the environment, just return the current
     # state with no modifications
     if module.check_mode:
         module.exit_json(**result)
 
-    query_resp: dict = get_advanced_selector_request(
-        api_url=api_url, api_token=api_token, api_log_directory=api_log_directory, query_list=query_list
-    )
+    try:
+        query_resp: dict = get_advanced_selector_request(
+            api_url=api_url, api_token=api_token, api_log_directory=api_log_directory, query_list=query_list, api_timeout=api_timeout
+        )
+    except Exception as e:
+        module.fail_json(
+            msg=f"Error sending api call: {e}", changed=False, failed=True
+        )
+
+    if query_resp is None:
+        module.fail_json(
+            msg="API call returned no response (check HTTP status code in logs)",
+            changed=False,
+            failed=True,
+        )
 
     if query_resp.get("ApiCallSuccessful", None):
         result["changed"] = False
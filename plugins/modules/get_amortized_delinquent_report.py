@@ -5,11 +5,13 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 from __future__ import absolute_import, division, print_function
 from ansible.module_utils.basic import AnsibleModule
-from typing import Callable, Any
-import requests
-import logging
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_api import (
+    ensure_dir,
+    log_function_call,
+    call_api,
+    write_base64_file,
+)
 import os
-import base64
 from datetime import datetime
 
 __metaclass__ = type
@@ -31,7 +33,10 @@ description:
 author:
     - Conrad Mercer
 
-requirements: [ ]
+requirements:
+     - requests >= 2.32.3
+     - orjson (optional, faster JSON encoding and decoding)
+     - pybase64 (optional, faster base64 decoding of the report)
 
 options:
     dest:
@@ -54,6 +59,11 @@ options:
         description: this is the directory that the API logs will be created in
         required: false
         type: str
+    api_timeout:
+        description: the number of seconds to wait for the API to respond before failing, building a report can take several minutes
+        required: false
+        default: 300
+        type: int
 """
 
 EXAMPLES = r"""
@@ -84,88 +94,20 @@ api_response:
 """
 
 
-def log_function_call(log_path: str, func: Callable[..., Any], *args, **kwargs) -> Any:
-    # Ensure the directory for the log file exists
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-
-    # Set up logging
-    logger = logging.getLogger(func.__name__)
-    logger.setLevel(logging.INFO)
-
-    # Create a file handler
-    handler = logging.FileHandler(f"{log_path}/api_calls.log")
-    handler.setLevel(logging.INFO)
-
-    # Create a logging format
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    handler.setFormatter(formatter)
-
-    # Add the handler to the logger
-    logger.addHandler(handler)
-
-    try:
-        # Log the function call and its arguments
-        logger.info(f"Calling {func.__name__}")
-        logger.info(f"Args: {args}")
-        logger.info(f"Kwargs: {kwargs}")
-
-        # Call the function and get the result
-        result = func(*args, **kwargs)
-
-        # Log the function's return value
-        logger.info(f"Result: {result}")
-
-        return result
-
-    except Exception as e:
-        logger.exception(f"Exception occurred: {str(e)}")
-        raise
-
-    finally:
-        # Remove the handler to avoid duplicate logs in future calls
-        logger.removeHandler(handler)
-
-
-def call_api(base_url: str, method: str, endpoint: str, parameters: dict):
-    # Define the headers (if required)
-    headers = {
-        "Content-Type": "application/json",  # Adjust the content type as needed
-    }
-
-    # Send the POST request
-
-    http: dict = {
-        "post": requests.post,
-        "get": requests.get,
-        "put": requests.put,
-        "delete": requests.delete,
-    }
-    response = http[method](base_url + endpoint, json=parameters, headers=headers)
-
-    # Capture the response
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(
-            f"Error response code ({response.status_code}) from api call: {response.text}"
-        )
-        return None
-
-
 def get_amortized_delinquent(
     api_url: str, 
     api_token: str, 
     api_log_directory: str,
+    system_time: str,
     api_due_date: str,
+    api_timeout: int,
 ) -> dict:
     params: dict = {
         "Message":{
             "DueDate": api_due_date,
             "IncludeForeclosedLoans": False,
             "Summarize": False,
-            "SystemDate": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            "SystemDate": system_time,
             "Token": api_token,
         }
     }
@@ -176,6 +118,7 @@ def get_amortized_delinquent(
         method="post",
         endpoint="ProcessAmortizedDelinquentReportData",
         parameters=params,
+        api_timeout=api_timeout,
     )
 
 
@@ -186,6 +129,7 @@ def run_module():
         api_token=dict(type="str", required=True, no_log=True),
         api_log_directory=dict(type="str", required=False, no_log=False),
         api_due_date=dict(type="str", required=True, no_log=False),
+        api_timeout=dict(type="int", required=False, default=300, no_log=False),
     )    
 
     # seed the result dict in the object
@@ -204,21 +148,37 @@ def run_module():
     api_url: str = module.params["fics_api_url"]
     api_token: str = module.params["api_token"]
     api_log_directory: str = module.params["api_log_directory"]
+    api_timeout: int = module.params["api_timeout"]
+    system_time: str = datetime.now().isoformat(timespec="seconds")
     api_due_date: str = module.params["api_due_date"]
     dest: str = module.params["dest"]
 
+    if api_timeout <= 0:
+        module.fail_json(
+            msg="api_timeout must be a positive number of seconds",
+            changed=False,
+            failed=True,
+        )
+
     # if the user is working with this module in only check mode we do not
     # want to make any changes to the environment, just return the current
     # state with no modifications
     if module.check_mode:
         module.exit_json(**result)
 
-    trial_resp: dict = get_amortized_delinquent(
-        api_url=api_url, 
-        api_token=api_token, 
-        api_log_directory=api_log_directory,
-        api_due_date=api_due_date,
-    )
+    try:
+        trial_resp: dict = get_amortized_delinquent(
+            api_url=api_url, 
+            api_token=api_token, 
+            api_log_directory=api_log_directory,
+            api_timeout=api_timeout,
+            system_time=system_time,
+            api_due_date=api_due_date,
+        )
+    except Exception as e:
+        module.fail_json(
+            msg=f"Error sending api call: {e}", changed=False, failed=True
+        )
 
     if trial_resp is None:
         module.fail_json(
@@ -230,7 +190,7 @@ def run_module():
     try:
         if trial_resp.get("ApiCallSuccessful", None):
             try:
-                os.makedirs(name=str(os.path.dirname(dest)), exist_ok=True)
+                ensure_dir(str(os.path.dirname(dest)))
             except Exception as e:
                 module.fail_json(
                     msg=f"failed to create parent directories: {e}",
@@ -239,9 +199,7 @@ def run_module():
                 )
             base64_file = trial_resp.get("ReportDocument", {}).get("DocumentBase64", None)
             if base64_file:
-                amortized_delinquent_report = base64.b64decode(base64_file)
-                with open(module.params["dest"], "wb") as amortized_delinquent_report_file:
-                    amortized_delinquent_report_file.write(amortized_delinquent_report)
+                write_base64_file(module, module.params["dest"], base64_file)
                 result["changed"] = True
                 result["failed"] = False
                 result["msg"] = f"Wrote file at {module.params['dest']}"
@@ -4,12 +4,13 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 from __future__ import absolute_import, division, print_function
 from ansible.module_utils.basic import AnsibleModule
-from typing import Callable, Any
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_api import (
+    log_function_call,
+    call_api,
+    write_base64_file,
+)
 from datetime import datetime
-import requests
-import logging
 import os
-import base64
 
 __metaclass__ = type
 
@@ -34,6 +35,8 @@ author:
 requirements:
      - logging >= 0.4.9.6
      - requests >= 2.32.3
+     - orjson (optional, faster JSON encoding and decoding)
+     - pybase64 (optional, faster base64 decoding of the report)
 
 options:
     dest:
@@ -80,6 +83,11 @@ options:
         description: this is the directory that the API logs will be created in
         required: false
         type: str
+    api_timeout:
+        description: the number of seconds to wait for the API to respond before failing, building a report can take several minutes
+        required: false
+        default: 300
+        type: int
 """
 
 EXAMPLES = r"""
@@ -102,76 +110,6 @@ RETURN = r"""
 """
 
 
-def log_function_call(log_path: str, func: Callable[..., Any], *args, **kwargs) -> Any:
-    # Ensure the directory for the log file exists
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-
-    # Set up logging
-    logger = logging.getLogger(func.__name__)
-    logger.setLevel(logging.INFO)
-
-    # Create a file handler
-    handler = logging.FileHandler(f"{log_path}/api_calls.log")
-    handler.setLevel(logging.INFO)
-
-    # Create a logging format
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    handler.setFormatter(formatter)
-
-    # Add the handler to the logger
-    logger.addHandler(handler)
-
-    try:
-        # Log the function call and its arguments
-        logger.info(f"Calling {func.__name__}")
-        logger.info(f"Args: {args}")
-        logger.info(f"Kwargs: {kwargs}")
-
-        # Call the function and get the result
-        result = func(*args, **kwargs)
-
-        # Log the function's return value
-        logger.info(f"Result: {result}")
-
-        return result
-
-    except Exception as e:
-        logger.exception(f"Exception occurred: {str(e)}")
-        raise
-
-    finally:
-        # Remove the handler to avoid duplicate logs in future calls
-        logger.removeHandler(handler)
-
-
-def call_api(base_url: str, method: str, endpoint: str, parameters: dict):
-    # Define the headers (if required)
-    headers = {
-        "Content-Type": "application/json",  # Adjust the content type as needed
-    }
-
-    # Send the POST request
-
-    http: dict = {
-        "post": requests.post,
-        "get": requests.get,
-        "put": requests.put,
-        "delete": requests.delete,
-    }
-    response = http[method](base_url + endpoint, json=parameters, headers=headers)
-
-    # Capture the response
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(
-            f"Error response code ({response.status_code}) from api call: {response.text}"
-        )
-        return None
-
-
 def process_window_object_data(
     api_token: str,
     api_url: str,
@@ -180,7 +118,8 @@ def process_window_object_data(
     address: str,
     city_state_zip: str,
     payoff_date: datetime,
-    api_log_directory: str
+    api_log_directory: str,
+    api_timeout: int,
 ):
     params: dict = {
         "WindowObject": {
@@ -231,6 +170,7 @@ All payoff figures are subject to clearance of funds in transit.  The payoff is
         "post",
         "ProcessWindowObjectData",
         parameters=params,
+        api_timeout=api_timeout,
     )
 
 
@@ -247,6 +187,7 @@ def run_module():
         core_api_url=dict(type="str", required=True, no_log=False),
         api_token=dict(type="str", required=True, no_log=True),
         api_log_directory=dict(type="str", required=False, no_log=False),
+        api_timeout=dict(type="int", required=False, default=300, no_log=False),
     )
 
     # seed the result dict in the object
@@ -265,6 +206,7 @@ def run_module():
     api_url: str = module.params["core_api_url"]
     api_token: str = module.params["api_token"]
     api_log_directory: str = module.params["api_log_directory"]
+    api_timeout: int = module.params["api_timeout"]
     dest: list[dict] = module.params["dest"]
     property_address: str = module.params["property_address"]
     loan_id: int = module.params["loan_id"]
@@ -274,28 +216,51 @@ def run_module():
     zip: str = module.params["zip"]
     payoff_date: datetime = datetime.strptime(module.params["payoff_date"], "%Y-%m-%d")
 
+    if api_timeout <= 0:
+        module.fail_json(
+            msg="api_timeout must be a positive number of seconds",
+            changed=False,
+            failed=True,
+        )
+
     # if the user is working with this module in only check mode we do not
     # want to make any changes to the environment, just return the current
     # state with no modifications
     if module.check_mode:
         module.exit_json(**result)
 
-    payoff_resp: dict = process_window_object_data(
-        api_url=api_url,
-        api_token=api_token,
-        api_log_directory=api_log_directory,
-        city_state_zip=f'{city}, {state} {zip}',
-        payoff_date=payoff_date,
-        address=property_address,
-        loan_id=loan_id,
-        full_name=loan_name
-    )
+    try:
+        payoff_resp: dict = process_window_object_data(
+            api_url=api_url,
+            api_token=api_token,
+            api_log_directory=api_log_directory,
+            api_timeout=api_timeout,
+            city_state_zip=f'{city}, {state} {zip}',
+            payoff_date=payoff_date,
+            address=property_address,
+            loan_id=loan_id,
+            full_name=loan_name
+        )
+    except Exception as e:
+        module.fail_json(
+            msg=f"Error sending api call: {e}", changed=False, failed=True
+        )
+
+    if payoff_resp is None:
+        module.fail_json(
+            msg="API call returned no response (check HTTP status code in logs)",
+            changed=False,
+            failed=True,
+        )
+
     if payoff_resp.get("ApiCallSuccessful", None):
         mail_name = payoff_resp.get("Data", {}).get("MailingCorrName", {}).replace(" ", "_") if payoff_resp.get("Data", {}).get("MailingCorrName", {}) else loan_name
         rest_of_name: str = "_" + str(loan_id) + "_" + datetime.now().strftime("%Y-%m-%d") + '_payoff_statement.pdf'
         file_name: str = mail_name + rest_of_name
-        with open(os.path.join(dest, file_name), 'wb') as f:
-            f.write(base64.b64decode(payoff_resp["Document"]["DocumentBase64"]))
+        try:
+            write_base64_file(module, os.path.join(dest, file_name), payoff_resp["Document"]["DocumentBase64"])
+        except Exception as e:
+            module.fail_json(msg=f"failed to create file: {e}", changed=False, failed=True)
         result["msg"] = "API call successful. File created"
         result["changed"] = False
         result["failed"] = False
@@ -4,12 +4,14 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 from __future__ import absolute_import, division, print_function
 from ansible.module_utils.basic import AnsibleModule
-from typing import Callable, Any
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_api import (
+    ensure_dir,
+    log_function_call,
+    call_api,
+    write_base64_files,
+)
 from datetime import datetime, timedelta
-import requests
-import logging
 import os
-import base64
 
 __metaclass__ = type
 
@@ -33,6 +35,8 @@ author:
 requirements:
      - logging >= 0.4.9.6
      - requests >= 2.32.3
+     - orjson (optional, faster JSON encoding and decoding)
+     - pybase64 (optional, faster base64 decoding of the report)
 
 options:
     dest:
@@ -55,6 +59,11 @@ options:
         description: this is the directory that the API logs will be created in
         required: false
         type: str
+    api_timeout:
+        description: the number of seconds to wait for the API to respond before failing, building a report can take several minutes
+        required: false
+        default: 300
+        type: int
 """
 
 EXAMPLES = r"""
@@ -71,77 +80,7 @@ RETURN = r"""
 """
 
 
-def log_function_call(log_path: str, func: Callable[..., Any], *args, **kwargs) -> Any:
-    # Ensure the directory for the log file exists
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-
-    # Set up logging
-    logger = logging.getLogger(func.__name__)
-    logger.setLevel(logging.INFO)
-
-    # Create a file handler
-    handler = logging.FileHandler(f"{log_path}/api_calls.log")
-    handler.setLevel(logging.INFO)
-
-    # Create a logging format
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    handler.setFormatter(formatter)
-
-    # Add the handler to the logger
-    logger.addHandler(handler)
-
-    try:
-        # Log the function call and its arguments
-        logger.info(f"Calling {func.__name__}")
-        logger.info(f"Args: {args}")
-        logger.info(f"Kwargs: {kwargs}")
-
-        # Call the function and get the result
-        result = func(*args, **kwargs)
-
-        # Log the function's return value
-        logger.info(f"Result: {result}")
-
-        return result
-
-    except Exception as e:
-        logger.exception(f"Exception occurred: {str(e)}")
-        raise
-
-    finally:
-        # Remove the handler to avoid duplicate logs in future calls
-        logger.removeHandler(handler)
-
-
-def call_api(base_url: str, method: str, endpoint: str, parameters: dict):
-    # Define the headers (if required)
-    headers = {
-        "Content-Type": "application/json",  # Adjust the content type as needed
-    }
-
-    # Send the POST request
-
-    http: dict = {
-        "post": requests.post,
-        "get": requests.get,
-        "put": requests.put,
-        "delete": requests.delete,
-    }
-    response = http[method](base_url + endpoint, json=parameters, headers=headers)
-
-    # Capture the response
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(
-            f"Error response code ({response.status_code}) from api call: {response.text}"
-        )
-        return None
-
-
-def run_late_notices_report(api_log_directory: str, api_url: str, api_token: str, beginning_date: datetime, ending_date: datetime):
+def run_late_notices_report(api_log_directory: str, api_url: str, api_token: str, beginning_date: datetime, ending_date: datetime, api_timeout: int):
     params: dict = {
         "Message": {
             "BeginningDate": beginning_date.strftime("%Y-%m-%dT%H:%M:%S"),
@@ -163,6 +102,7 @@ def run_late_notices_report(api_log_directory: str, api_url: str, api_token: str
         method="post",
         endpoint="RunLateNoticesReport",
         parameters=params,
+        api_timeout=api_timeout,
     )
 
 
@@ -173,6 +113,7 @@ def run_module():
         batch_service_api_url=dict(type="str", required=True, no_log=False),
         api_token=dict(type="str", required=True, no_log=True),
         api_log_directory=dict(type="str", required=False, no_log=False),
+        api_timeout=dict(type="int", required=False, default=300, no_log=False),
     )
 
     # seed the result dict in the object
@@ -191,8 +132,16 @@ def run_module():
     api_url: str = module.params["batch_service_api_url"]
     api_token: str = module.params["api_token"]
     api_log_directory: str = module.params["api_log_directory"]
+    api_timeout: int = module.params["api_timeout"]
     dest: str = module.params["dest"]
 
+    if api_timeout <= 0:
+        module.fail_json(
+            msg="api_timeout must be a positive number of seconds",
+            changed=False,
+            failed=True,
+        )
+
     # if the user is working with this module in only check mode we do not
     # want to make any changes to the environment, just return the current
     # state with no modifications
@@ -201,14 +150,26 @@ def run_module():
 
     ending_date: datetime = datetime.now()
     beginning_date: datetime = ending_date - timedelta(days=365)
-    late_notice_resp: dict = run_late_notices_report(
-        api_url=api_url, api_token=api_token, api_log_directory=api_log_directory, beginning_date=beginning_date, ending_date=ending_date
-    )
+    try:
+        late_notice_resp: dict = run_late_notices_report(
+            api_url=api_url, api_token=api_token, api_log_directory=api_log_directory, beginning_date=beginning_date, ending_date=ending_date, api_timeout=api_timeout
+        )
+    except Exception as e:
+        module.fail_json(
+            msg=f"Error sending api call: {e}", changed=False, failed=True
+        )
+
+    if late_notice_resp is None:
+        module.fail_json(
+            msg="API call returned no response (check HTTP status code in logs)",
+            changed=False,
+            failed=True,
+        )
 
     try:
         if late_notice_resp.get("ApiCallSuccessful", None):
             try:
-                os.makedirs(name=str(os.path.dirname(dest)), exist_ok=True)
+                ensure_dir(str(os.path.dirname(dest)))
             except Exception as e:
                 module.fail_json(
                     msg=f"failed to create parent directories: {e}",
@@ -218,12 +179,15 @@ def run_module():
             base64_late_notices_file = late_notice_resp.get("LateNotice", {}).get("Document", {}).get("DocumentBase64", None)
             base64_late_notice_summary_file = late_notice_resp.get("LateNoticeSummaryReport", {}).get("Document", {}).get("DocumentBase64", None)
             if base64_late_notices_file and base64_late_notice_summary_file:
-                txt_data = base64.b64decode(base64_late_notices_file)
-                with open(module.params["dest"], "wb") as txt_file:
-                    txt_file.write(txt_data)
-                txt_data = base64.b64decode(base64_late_notice_summary_file)
-                with open(module.params["summary_dest"], "wb") as txt_file:
-                    txt_file.write(txt_data)
+                # decode both documents before moving either into place, so a bad
+                # payload never leaves new notices next to an old summary
+                write_base64_files(
+                    module,
+                    {
+                        module.params["dest"]: base64_late_notices_file,
+                        module.params["summary_dest"]: base64_late_notice_summary_file,
+                    },
+                )
                 result["changed"] = True
                 result["failed"] = False
                 result["msg"] = f"Wrote file at {module.params['dest']}"